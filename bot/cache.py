@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, Dict, Hashable, Tuple
+
+
+class AsyncTTLCache:
+    """
+    Bounded mapping whose entries expire on their own.
+
+    Each insert schedules its expiry with loop.call_later, so stale entries
+    disappear even when no further traffic arrives. When max_size is reached
+    the oldest entry is evicted (FIFO). Must be used from within the event loop.
+    """
+
+    def __init__(self, ttl: float, max_size: int = 10000):
+        """
+        Args:
+            ttl: Seconds an entry lives after being set
+            max_size: Maximum number of entries
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        # Insertion-ordered: first key is the oldest
+        self._data: Dict[Hashable, Tuple[Any, asyncio.TimerHandle]] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __getitem__(self, key: Hashable) -> Any:
+        return self._data[key][0]
+
+    def __setitem__(self, key: Hashable, value: Any):
+        self.pop(key)
+
+        while len(self._data) >= self.max_size:
+            oldest = next(iter(self._data))
+            self.pop(oldest)
+
+        handle = asyncio.get_running_loop().call_later(self.ttl, self._expire, key)
+        self._data[key] = (value, handle)
+
+    def __delitem__(self, key: Hashable):
+        _, handle = self._data.pop(key)
+        handle.cancel()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        return item[0] if item else default
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.pop(key, None)
+        if item is None:
+            return default
+        item[1].cancel()
+        return item[0]
+
+    def clear(self):
+        for _, handle in self._data.values():
+            handle.cancel()
+        self._data.clear()
+
+    def _expire(self, key: Hashable):
+        """Timer callback: drop the entry (overwrites cancel the old timer)."""
+        self._data.pop(key, None)
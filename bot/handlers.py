@@ -1,18 +1,53 @@
 import logging
 import asyncio
+import hashlib
 import time
-from datetime import datetime
-from typing import Optional, Dict
+from typing import Callable, Optional, Dict, Tuple
 
-from telegram import Update
+from telegram import Bot, Message, Update
 from telegram.ext import ContextTypes
 
+from bot.cache import AsyncTTLCache
 from bot.keyboards import Keyboards
+from bot.models import BufferedMessage, PendingTime, LastReminder
 from services.openai_service import OpenAIService
 from services.google_sheets import GoogleSheetsService
 
 logger = logging.getLogger(__name__)
 
+_SUCCESS_HEADER = "<b>Reminder created!</b>\n"
+
+# Status lines appended to a message when one of its buttons is pressed
+_SUFFIX_DONE = "\n\n<b>Status: Done</b>"
+_SUFFIX_RELEVANT = "\n\n<i>Marked as still relevant</i>"
+_SUFFIX_CANCELED = (
+    "\n\n<b>Canceled</b>\n"
+    "<i>This task is marked as no longer relevant. No future reminders will be sent.</i>"
+)
+_SUFFIX_SETTIME = "\n\n<i>Please send the deadline (e.g., 'tomorrow at 15:00')</i>"
+
+# Callback data produced by Keyboards; anything else is ignored
+_CALLBACK_PREFIXES = ("done_", "relevant_", "cancel_", "settime_", "confirm_ok")
+
+# python-telegram-bot >= 20.8 exposes forward_origin, older versions forward_date/forward_from
+_HAS_FORWARD_ORIGIN = hasattr(Message, 'forward_origin')
+
+
+def _format_user(user) -> str:
+    """Display name for a forwarded message's user."""
+    name = " ".join(filter(None, [user.first_name, user.last_name]))
+    username = f"@{user.username}" if getattr(user, 'username', None) else ""
+    return name or username or str(user.id)
+
+
+# Forward origin author formatters keyed by MessageOrigin.type
+_ORIGIN_HANDLERS = {
+    'user': lambda origin: _format_user(origin.sender_user),
+    'hidden_user': lambda origin: origin.sender_user_name,
+    'chat': lambda origin: f"Chat: {origin.sender_chat.title}" if origin.sender_chat.title else None,
+    'channel': lambda origin: f"Channel: {origin.chat.title}" if origin.chat.title else None,
+}
+
 
 class BotHandlers:
     """
@@ -29,29 +64,83 @@ class BotHandlers:
         self,
         openai_service: OpenAIService,
         sheets_service: GoogleSheetsService,
-        timezone: str = 'Europe/Moscow'
+        timezone: str = 'Europe/Moscow',
+        on_reminder_scheduled: Optional[Callable[[Dict], None]] = None
     ):
+        """
+        Args:
+            openai_service: Service for extraction and transcription
+            sheets_service: Reminder storage
+            timezone: Default timezone
+            on_reminder_scheduled: Called with {'row', 'datetime', 'timezone'} whenever
+                a reminder gets a time, so it can be scheduled for delivery
+        """
         self.openai = openai_service
         self.sheets = sheets_service
         self.timezone = timezone
+        self.on_reminder_scheduled = on_reminder_scheduled
 
-        # Buffer for linking messages (explanation + forwarded)
-        # {user_id: {'message': str, 'is_forwarded': bool, 'timestamp': float, 'update': Update, 'task': Task}}
-        self.message_buffer: Dict[int, Dict] = {}
         self.MESSAGE_LINK_TIMEOUT = 60  # seconds - time window for pairing
         self.WAIT_FOR_FORWARDED = 15  # seconds - wait for forwarded after explanation
         self.WAIT_FOR_EXPLANATION = 5  # seconds - wait for explanation after forwarded (rare case)
+        self.STATE_MAX_USERS = 10000  # cap on per-user entries in each state store
+
+        # Buffer for linking messages (explanation + forwarded)
+        self.message_buffer = AsyncTTLCache(
+            ttl=self.MESSAGE_LINK_TIMEOUT * 2, max_size=self.STATE_MAX_USERS
+        )
+
+        # Users who forwarded something recently; only they get a pairing window
+        # for plain messages, everyone else's text is processed immediately
+        self.FORWARDER_TTL = 7 * 24 * 60 * 60  # seconds
+        self._recent_forwarders = AsyncTTLCache(ttl=self.FORWARDER_TTL, max_size=self.STATE_MAX_USERS)
+
+        # Store last reminder info for callback handling (kept for a day)
+        self.last_reminders = AsyncTTLCache(ttl=24 * 60 * 60, max_size=self.STATE_MAX_USERS)
+
+        # Store pending time inputs (abandoned inputs expire after 10 minutes)
+        self.pending_time_input = AsyncTTLCache(ttl=10 * 60, max_size=self.STATE_MAX_USERS)
+
+        # Queue of reminders waiting to be written to sheets in one batch
+        # (payload, future resolved with row number)
+        self._write_queue: asyncio.Queue = asyncio.Queue()
+        self._writer_task: Optional[asyncio.Task] = None
+        self.WRITE_BATCH_WINDOW = 0.05  # seconds - time to collect more reminders
+        self.WRITE_BATCH_SIZE = 20  # max reminders per append request
+
+        # Recent OpenAI extraction results keyed by minute and normalized text
+        # hash, so a message re-sent within the same minute doesn't cost another API call
+        self._llm_cache = AsyncTTLCache(ttl=60, max_size=1024)
+
+        # Strong references to fire-and-forget tasks (asyncio keeps only weak ones)
+        self._background_tasks = set()
+
+        # Callback data is '<action>_<row>' (or 'confirm_ok')
+        self._callback_handlers = {
+            'done': self._cb_done,
+            'relevant': self._cb_relevant,
+            'cancel': self._cb_cancel,
+            'settime': self._cb_settime,
+            'confirm': self._cb_confirm,
+        }
 
-        # Pending processing tasks
-        self.pending_tasks: Dict[int, asyncio.Task] = {}
+    async def close(self):
+        """
+        Finish pending work, then release the services.
 
-        # Store last reminder info for callback handling
-        # {user_id: {'row': int, ...}}
-        self.last_reminders: Dict[int, Dict] = {}
+        Waits for background processing and status updates, drains the reminder
+        writer, and only then closes the OpenAI client and flushes queued sheet writes.
+        """
+        # Processing tasks may still queue reminders or status writes
+        if self._background_tasks:
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
 
-        # Store pending time inputs
-        # {user_id: {'row': int, 'awaiting_time': bool}}
-        self.pending_time_input: Dict[int, Dict] = {}
+        if self._writer_task is not None and not self._writer_task.done():
+            await self._write_queue.join()
+            self._writer_task.cancel()
+
+        await self.openai.close()
+        await asyncio.to_thread(self.sheets.flush_writes)
 
     async def handle_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command."""
@@ -106,13 +195,9 @@ Will be stored and reviewed weekly.
 
     def _is_forwarded(self, message) -> bool:
         """Check if message is forwarded (compatible with different library versions)."""
-        # Try forward_origin first (newer versions)
-        if hasattr(message, 'forward_origin') and message.forward_origin:
-            return True
-        # Fallback to forward_date (older versions)
-        if hasattr(message, 'forward_date') and message.forward_date:
-            return True
-        return False
+        if _HAS_FORWARD_ORIGIN:
+            return message.forward_origin is not None
+        return message.forward_date is not None
 
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
@@ -120,7 +205,7 @@ Will be stored and reviewed weekly.
 
         Logic:
         1. Check if there's a buffered message that can form a pair
-        2. If pair found - cancel pending task and process pair
+        2. If pair found - wake the pending waiter and process pair
         3. If no pair - save to buffer and schedule delayed processing
         """
         user_id = update.effective_user.id
@@ -129,133 +214,143 @@ Will be stored and reviewed weekly.
         message_text = message.text or message.caption or ""
 
         # Check if user is inputting time for a timeless reminder
-        if user_id in self.pending_time_input and self.pending_time_input[user_id].get('awaiting_time'):
+        if user_id in self.pending_time_input and self.pending_time_input[user_id].awaiting_time:
             await self._handle_time_input(update, context, message_text)
             return
 
-        logger.info(f"Message from {user_id}: forwarded={is_forwarded}, text={message_text[:50]}...")
+        logger.info("Message from %s: forwarded=%s, text=%.50s...", user_id, is_forwarded, message_text)
+
+        forward_author = self._get_forward_author(message) if is_forwarded else ''
+
+        if is_forwarded:
+            self._recent_forwarders[user_id] = True
+        elif user_id not in self._recent_forwarders and user_id not in self.message_buffer:
+            # Fast path: this user doesn't forward messages, nothing to pair with.
+            # Process in the background so the next update isn't held up.
+            self._run_in_background(self._process_single_message(
+                text=message_text,
+                user_id=user_id,
+                chat_id=message.chat_id,
+                bot=context.bot
+            ))
+            return
 
-        current_time = time.time()
+        current_time = time.monotonic()
 
         # Check if there's a recent message in buffer (potential pair)
-        if user_id in self.message_buffer:
-            existing = self.message_buffer[user_id]
-            time_diff = current_time - existing['timestamp']
-
-            if time_diff < self.MESSAGE_LINK_TIMEOUT:
-                # Check if this is a pair (one forwarded, one not)
-                if existing['is_forwarded'] != is_forwarded:
-                    # This is a pair! Cancel pending task
-                    if user_id in self.pending_tasks:
-                        self.pending_tasks[user_id].cancel()
-                        del self.pending_tasks[user_id]
-
-                    logger.info(f"Found message pair for user {user_id}")
-
-                    if is_forwarded:
-                        # Current is forwarded, existing is explanation
-                        await self._process_pair(
-                            explanation=existing['message'],
-                            forwarded_text=message_text,
-                            forwarded_author=self._get_forward_author(message),
-                            update=existing['update'],
-                            context=context
-                        )
-                    else:
-                        # Current is explanation, existing is forwarded
-                        await self._process_pair(
-                            explanation=message_text,
-                            forwarded_text=existing['message'],
-                            forwarded_author=existing.get('forward_author', ''),
-                            update=update,
-                            context=context
-                        )
-                    # Clear buffer
-                    del self.message_buffer[user_id]
-                    return
-
-        # Cancel any existing pending task for this user
-        if user_id in self.pending_tasks:
-            self.pending_tasks[user_id].cancel()
-            del self.pending_tasks[user_id]
+        existing = self.message_buffer.get(user_id)
+        if existing and current_time - existing.timestamp < self.MESSAGE_LINK_TIMEOUT:
+            # Check if this is a pair (one forwarded, one not)
+            if existing.is_forwarded != is_forwarded:
+                # This is a pair! Take it out of the buffer and wake the waiter,
+                # which returns immediately instead of processing it as single
+                del self.message_buffer[user_id]
+                existing.pair_event.set()
+
+                logger.info("Found message pair for user %s", user_id)
+
+                if is_forwarded:
+                    # Current is forwarded, existing is explanation
+                    await self._process_pair(
+                        explanation=existing.message,
+                        forwarded_text=message_text,
+                        forwarded_author=forward_author,
+                        user_id=user_id,
+                        chat_id=existing.chat_id,
+                        bot=context.bot
+                    )
+                else:
+                    # Current is explanation, existing is forwarded
+                    await self._process_pair(
+                        explanation=message_text,
+                        forwarded_text=existing.message,
+                        forwarded_author=existing.forward_author,
+                        user_id=user_id,
+                        chat_id=message.chat_id,
+                        bot=context.bot
+                    )
+                return
+
+        # Wake the waiter of any message this one supersedes
+        if existing:
+            existing.pair_event.set()
 
         # Save to buffer
-        self.message_buffer[user_id] = {
-            'message': message_text,
-            'is_forwarded': is_forwarded,
-            'timestamp': current_time,
-            'update': update,
-            'context': context,
-            'forward_author': self._get_forward_author(message) if is_forwarded else ''
-        }
+        entry = BufferedMessage(
+            message=message_text,
+            is_forwarded=is_forwarded,
+            timestamp=current_time,
+            chat_id=message.chat_id,
+            forward_author=forward_author
+        )
+        self.message_buffer[user_id] = entry
 
-        # Schedule delayed processing (non-blocking)
+        # Wait for a pair in the background (non-blocking: the next update for
+        # this user must reach handle_message to complete the pair).
         # Wait longer for forwarded message if this is explanation, shorter otherwise
         wait_time = self.WAIT_FOR_FORWARDED if not is_forwarded else self.WAIT_FOR_EXPLANATION
 
-        task = asyncio.create_task(
-            self._delayed_process_single(user_id, current_time, wait_time)
+        entry.task = asyncio.create_task(
+            self._delayed_process_single(user_id, entry, wait_time, context.bot)
         )
-        self.pending_tasks[user_id] = task
 
-    async def _delayed_process_single(self, user_id: int, original_timestamp: float, wait_time: float):
-        """Process single message after delay if not paired."""
+    async def _delayed_process_single(self, user_id: int, entry: BufferedMessage, wait_time: float, bot: Bot):
+        """Process single message if no pair arrives within wait_time."""
         try:
-            await asyncio.sleep(wait_time)
-
-            # Check if message still in buffer and not replaced
-            if user_id not in self.message_buffer:
+            try:
+                await asyncio.wait_for(entry.pair_event.wait(), timeout=wait_time)
+                # Woken up early: paired or superseded by a newer message
                 return
+            except asyncio.TimeoutError:
+                pass
 
-            data = self.message_buffer[user_id]
-            if data['timestamp'] != original_timestamp:
-                # Message was replaced, don't process old one
+            # Check if message still in buffer and not replaced
+            if self.message_buffer.get(user_id) is not entry:
                 return
-
-            # Remove from buffer and pending tasks
             del self.message_buffer[user_id]
-            if user_id in self.pending_tasks:
-                del self.pending_tasks[user_id]
 
-            logger.info(f"Processing single message for user {user_id}")
+            logger.info("Processing single message for user %s", user_id)
 
             # Process as single message
-            if data['is_forwarded']:
+            if entry.is_forwarded:
                 await self._process_single_forwarded(
-                    forwarded_text=data['message'],
-                    forwarded_author=data['forward_author'],
-                    update=data['update'],
-                    context=data['context']
+                    forwarded_text=entry.message,
+                    forwarded_author=entry.forward_author,
+                    user_id=user_id,
+                    chat_id=entry.chat_id,
+                    bot=bot
                 )
             else:
                 await self._process_single_message(
-                    text=data['message'],
-                    update=data['update'],
-                    context=data['context']
+                    text=entry.message,
+                    user_id=user_id,
+                    chat_id=entry.chat_id,
+                    bot=bot
                 )
 
-        except asyncio.CancelledError:
-            # Task was cancelled because pair was found
-            logger.info(f"Delayed processing cancelled for user {user_id} (pair found)")
         except Exception as e:
-            logger.error(f"Error in delayed processing: {e}")
+            logger.error("Error in delayed processing: %s", e)
 
     async def handle_voice(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle voice messages."""
         user_id = update.effective_user.id
         voice = update.message.voice
 
-        logger.info(f"Voice message from {user_id}, duration: {voice.duration}s")
+        logger.info("Voice message from %s, duration: %ss", user_id, voice.duration)
 
-        processing_msg = await update.message.reply_text("Transcribing voice message...")
+        # Start downloading while the status message is being sent
+        download = asyncio.create_task(self._download_voice(context.bot, voice.file_id))
+        try:
+            processing_msg = await update.message.reply_text("Transcribing voice message...")
+        except Exception:
+            download.cancel()
+            raise
 
         try:
-            # Download voice file directly using Telegram API
-            file = await context.bot.get_file(voice.file_id)
-            audio_bytes = await file.download_as_bytearray()
+            audio_bytes = await download
 
             # Transcribe
-            text = await self.openai.transcribe_voice(bytes(audio_bytes))
+            text = await self.openai.transcribe_voice(audio_bytes)
 
             if not text:
                 await processing_msg.edit_text(
@@ -270,7 +365,7 @@ Will be stored and reviewed weekly.
             )
 
             # Process as regular message
-            reminder_info, error = self.openai.extract_and_validate(text)
+            reminder_info, error = await self._extract_and_validate(text)
 
             if not reminder_info:
                 await processing_msg.edit_text(
@@ -281,7 +376,7 @@ Will be stored and reviewed weekly.
                 return
 
             # Save to sheets
-            row = self.sheets.add_reminder(
+            row = await self._enqueue_add_reminder(
                 text=reminder_info['text'],
                 datetime_str=reminder_info.get('datetime'),
                 timezone=reminder_info.get('timezone', self.timezone),
@@ -289,7 +384,7 @@ Will be stored and reviewed weekly.
             )
 
             if row:
-                self.last_reminders[user_id] = {'row': row, **reminder_info}
+                self.last_reminders[user_id] = LastReminder.from_info(row, reminder_info)
                 await processing_msg.edit_text(
                     self._format_success_message(reminder_info, text),
                     parse_mode='HTML'
@@ -298,9 +393,14 @@ Will be stored and reviewed weekly.
                 await processing_msg.edit_text("Error saving reminder. Please try again.")
 
         except Exception as e:
-            logger.error(f"Error processing voice: {e}")
+            logger.error("Error processing voice: %s", e)
             await processing_msg.edit_text("Error processing voice message.")
 
+    async def _download_voice(self, bot: Bot, file_id: str) -> bytes:
+        """Download voice file directly using Telegram API."""
+        file = await bot.get_file(file_id)
+        return bytes(await file.download_as_bytearray())
+
     async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle inline button callbacks."""
         query = update.callback_query
@@ -309,46 +409,85 @@ Will be stored and reviewed weekly.
 
         await query.answer()
 
-        logger.info(f"Callback from {user_id}: {data}")
+        if not data or not data.startswith(_CALLBACK_PREFIXES):
+            logger.warning("Unknown callback data from %s: %r", user_id, data)
+            return
+
+        logger.info("Callback from %s: %s", user_id, data)
+
+        prefix, _, rest = data.partition('_')
+        handler = self._callback_handlers[prefix]
 
         try:
-            if data.startswith("done_"):
-                row = int(data.split("_")[1])
-                self.sheets.update_status(row, "done")
-                await query.edit_message_text(
-                    query.message.text + "\n\n<b>Status: Done</b>",
-                    parse_mode='HTML'
-                )
+            # Every action except 'confirm_ok' carries a row number
+            row = int(rest) if rest.isdigit() else None
+            if row is None and prefix != 'confirm':
+                raise ValueError(f"Invalid row in callback data: {data}")
 
-            elif data.startswith("relevant_"):
-                row = int(data.split("_")[1])
-                await query.edit_message_text(
-                    query.message.text + "\n\n<i>Marked as still relevant</i>",
-                    parse_mode='HTML'
-                )
+            await handler(query, row, user_id)
 
-            elif data.startswith("cancel_"):
-                row = int(data.split("_")[1])
-                self.sheets.update_status(row, "cancel")
-                await query.edit_message_text(
-                    query.message.text + "\n\n<b>Canceled</b>\n<i>This task is marked as no longer relevant. No future reminders will be sent.</i>",
-                    parse_mode='HTML'
-                )
+        except Exception as e:
+            logger.error("Error handling callback: %s", e)
+            await query.edit_message_text("Error processing action.")
 
-            elif data.startswith("settime_"):
-                row = int(data.split("_")[1])
-                self.pending_time_input[user_id] = {'row': row, 'awaiting_time': True}
-                await query.edit_message_text(
-                    query.message.text + "\n\n<i>Please send the deadline (e.g., 'tomorrow at 15:00')</i>",
-                    parse_mode='HTML'
-                )
+    async def _cb_done(self, query, row: int, user_id: int):
+        """Mark reminder as done."""
+        await self._finish_in_background(query, row, "done", _SUFFIX_DONE)
+
+    async def _cb_relevant(self, query, row: int, user_id: int):
+        """Keep timeless reminder for the next weekly review."""
+        await self._append_status(query, _SUFFIX_RELEVANT)
+
+    async def _cb_cancel(self, query, row: int, user_id: int):
+        """Mark reminder as no longer relevant."""
+        await self._finish_in_background(query, row, "cancel", _SUFFIX_CANCELED)
 
-            elif data == "confirm_ok":
-                await query.edit_message_reply_markup(None)
+    async def _cb_settime(self, query, row: int, user_id: int):
+        """Ask the user for a deadline for a timeless reminder."""
+        self.pending_time_input[user_id] = PendingTime(row=row)
+        await self._append_status(query, _SUFFIX_SETTIME)
 
+    async def _cb_confirm(self, query, row: Optional[int], user_id: int):
+        """Remove the confirmation keyboard."""
+        await query.edit_message_reply_markup(None)
+
+    async def _finish_in_background(self, query, row: int, status: str, suffix: str):
+        """
+        Remove the buttons right away, then update the sheet and the message text
+        in a background task so the user sees the press take effect after one round-trip.
+        """
+        await query.edit_message_reply_markup(None)
+        self._run_in_background(self._finalize_callback(query, row, status, suffix))
+
+    def _run_in_background(self, coro):
+        """Run a coroutine as a task, keeping a reference until it finishes."""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._on_background_done)
+
+    def _on_background_done(self, task: asyncio.Task):
+        """Drop the finished task and log an exception it didn't handle."""
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Error in background task: %s", task.exception())
+
+    async def _finalize_callback(self, query, row: int, status: str, suffix: str):
+        """Persist the new status and append it to the message."""
+        try:
+            await asyncio.to_thread(self.sheets.update_status, row, status)
+            if query.message.text is not None:
+                await self._append_status(query, suffix)
         except Exception as e:
-            logger.error(f"Error handling callback: {e}")
-            await query.edit_message_text("Error processing action.")
+            logger.error("Error finalizing callback for row %s: %s", row, e)
+
+    async def _append_status(self, query, suffix: str):
+        """Append a status line to the message and drop its buttons."""
+        text = query.message.text
+        if text is None:
+            # Nothing to append to (e.g. media message), just remove the buttons
+            await query.edit_message_reply_markup(None)
+            return
+        await query.edit_message_text("".join((text, suffix)), parse_mode='HTML')
 
     async def _handle_time_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
         """Handle time input for timeless reminder conversion."""
@@ -358,10 +497,10 @@ Will be stored and reviewed weekly.
         if not pending:
             return
 
-        row = pending['row']
+        row = pending.row
 
         # Extract datetime from user input
-        reminder_info, error = self.openai.extract_and_validate(f"Remind me {text}")
+        reminder_info, error = await self._extract_and_validate(f"Remind me {text}")
 
         if not reminder_info or not reminder_info.get('datetime'):
             await update.message.reply_text(
@@ -370,26 +509,22 @@ Will be stored and reviewed weekly.
             self.pending_time_input[user_id] = pending  # Restore pending state
             return
 
-        # Update the reminder in sheets
-        success = self.sheets.update_datetime(row, reminder_info['datetime'])
+        # Update the reminder in sheets (queued; a failed write is retried by the service)
+        timezone = reminder_info.get('timezone', self.timezone)
+        await asyncio.to_thread(self.sheets.update_datetime, row, reminder_info['datetime'], timezone)
+        self._notify_scheduled(row, reminder_info['datetime'], timezone)
 
-        if success:
-            dt = datetime.strptime(reminder_info['datetime'], '%Y-%m-%d %H:%M:%S')
-            formatted = dt.strftime('%d.%m.%Y at %H:%M')
-            await update.message.reply_text(
-                f"Deadline set: <b>{formatted}</b>",
-                parse_mode='HTML'
-            )
-        else:
-            await update.message.reply_text("Error updating reminder. Please try again.")
+        formatted = self._fmt_dt(reminder_info['datetime'])
+        await update.message.reply_text(
+            f"Deadline set: <b>{formatted}</b>",
+            parse_mode='HTML'
+        )
 
-    async def _process_single_message(self, text: str, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def _process_single_message(self, text: str, user_id: int, chat_id: int, bot: Bot):
         """Process a single (non-forwarded) message."""
-        user_id = update.effective_user.id
-
-        processing_msg = await update.message.reply_text("Processing...")
+        processing_msg = await bot.send_message(chat_id, "Processing...")
 
-        reminder_info, error = self.openai.extract_and_validate(text)
+        reminder_info, error = await self._extract_and_validate(text)
 
         if not reminder_info:
             await processing_msg.edit_text(
@@ -400,7 +535,7 @@ Will be stored and reviewed weekly.
             )
             return
 
-        row = self.sheets.add_reminder(
+        row = await self._enqueue_add_reminder(
             text=reminder_info['text'],
             datetime_str=reminder_info.get('datetime'),
             timezone=reminder_info.get('timezone', self.timezone),
@@ -408,7 +543,7 @@ Will be stored and reviewed weekly.
         )
 
         if row:
-            self.last_reminders[user_id] = {'row': row, **reminder_info}
+            self.last_reminders[user_id] = LastReminder.from_info(row, reminder_info)
             await processing_msg.edit_text(
                 self._format_success_message(reminder_info),
                 parse_mode='HTML'
@@ -420,16 +555,15 @@ Will be stored and reviewed weekly.
         self,
         forwarded_text: str,
         forwarded_author: str,
-        update: Update,
-        context: ContextTypes.DEFAULT_TYPE
+        user_id: int,
+        chat_id: int,
+        bot: Bot
     ):
         """Process a single forwarded message (no explanation)."""
-        user_id = update.effective_user.id
-
-        processing_msg = await update.message.reply_text("Processing forwarded message...")
+        processing_msg = await bot.send_message(chat_id, "Processing forwarded message...")
 
         # Extract info from forwarded content
-        reminder_info = self.openai.extract_forwarded_message_info(forwarded_text)
+        reminder_info = await self._extract_forwarded_message_info(forwarded_text)
 
         if not reminder_info:
             await processing_msg.edit_text(
@@ -446,7 +580,7 @@ Will be stored and reviewed weekly.
                 await processing_msg.edit_text(f"Error: {error}")
                 return
 
-        row = self.sheets.add_reminder(
+        row = await self._enqueue_add_reminder(
             text=reminder_info['text'],
             datetime_str=reminder_info.get('datetime'),
             timezone=reminder_info.get('timezone', self.timezone),
@@ -456,7 +590,7 @@ Will be stored and reviewed weekly.
         )
 
         if row:
-            self.last_reminders[user_id] = {'row': row, **reminder_info}
+            self.last_reminders[user_id] = LastReminder.from_info(row, reminder_info)
             await processing_msg.edit_text(
                 self._format_success_message(
                     reminder_info,
@@ -473,23 +607,22 @@ Will be stored and reviewed weekly.
         explanation: str,
         forwarded_text: str,
         forwarded_author: str,
-        update: Update,
-        context: ContextTypes.DEFAULT_TYPE
+        user_id: int,
+        chat_id: int,
+        bot: Bot
     ):
         """Process a pair of messages: explanation + forwarded."""
-        user_id = update.effective_user.id
-
-        processing_msg = await update.message.reply_text("Processing message pair...")
+        processing_msg = await bot.send_message(chat_id, "Processing message pair...")
 
         # Use explanation for reminder info
-        reminder_info, error = self.openai.extract_and_validate(explanation)
+        reminder_info, error = await self._extract_and_validate(explanation)
 
         if not reminder_info:
             await processing_msg.edit_text(f"Could not create reminder: {error}")
             return
 
         # Save with forwarded message as comment
-        row = self.sheets.add_reminder(
+        row = await self._enqueue_add_reminder(
             text=reminder_info['text'],
             datetime_str=reminder_info.get('datetime'),
             timezone=reminder_info.get('timezone', self.timezone),
@@ -499,7 +632,7 @@ Will be stored and reviewed weekly.
         )
 
         if row:
-            self.last_reminders[user_id] = {'row': row, **reminder_info}
+            self.last_reminders[user_id] = LastReminder.from_info(row, reminder_info)
             await processing_msg.edit_text(
                 self._format_success_message(
                     reminder_info,
@@ -511,54 +644,138 @@ Will be stored and reviewed weekly.
         else:
             await processing_msg.edit_text("Error saving reminder.")
 
+    @staticmethod
+    def _llm_cache_key(kind: str, text: str) -> Tuple[str, int, bytes]:
+        """
+        Cache key for an extraction: the current minute plus a case- and
+        whitespace-insensitive text hash.
+
+        The model resolves relative phrases ("tomorrow at 9", "in 10 minutes")
+        against the current time in the prompt, so a result is only reused
+        within the minute it was computed.
+        """
+        normalized = " ".join(text.split()).lower()
+        minute = int(time.time() // 60)
+        return kind, minute, hashlib.blake2b(normalized.encode(), digest_size=16).digest()
+
+    async def _extract_and_validate(self, text: str) -> Tuple[Optional[Dict], str]:
+        """OpenAIService.extract_and_validate with a short-lived result cache."""
+        key = self._llm_cache_key('extract', text)
+        cached = self._llm_cache.get(key)
+        if cached is not None:
+            # A cached time may have passed since it was extracted
+            is_valid, _ = self.openai.validate_reminder_info(cached)
+            if is_valid:
+                return dict(cached), ""
+            self._llm_cache.pop(key)
+
+        reminder_info, error = await self.openai.extract_and_validate(text)
+        if reminder_info:
+            self._llm_cache[key] = dict(reminder_info)
+        return reminder_info, error
+
+    async def _extract_forwarded_message_info(self, forwarded_text: str) -> Optional[Dict]:
+        """OpenAIService.extract_forwarded_message_info with a short-lived result cache."""
+        key = self._llm_cache_key('forwarded', forwarded_text)
+        cached = self._llm_cache.get(key)
+        if cached is not None:
+            return dict(cached)
+
+        reminder_info = await self.openai.extract_forwarded_message_info(forwarded_text)
+        if reminder_info:
+            self._llm_cache[key] = dict(reminder_info)
+        return reminder_info
+
+    async def _enqueue_add_reminder(self, **payload) -> Optional[int]:
+        """
+        Queue a reminder for the batched sheets writer and wait for its row.
+
+        Accepts the same keyword arguments as GoogleSheetsService.add_reminder.
+        """
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._sheets_writer_loop())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._write_queue.put((payload, future))
+        row = await future
+
+        if row and payload.get('datetime_str'):
+            self._notify_scheduled(row, payload['datetime_str'], payload.get('timezone', self.timezone))
+        return row
+
+    def _notify_scheduled(self, row: int, datetime_str: str, timezone: str):
+        """Pass a timed reminder to the on_reminder_scheduled hook."""
+        if not self.on_reminder_scheduled:
+            return
+        try:
+            self.on_reminder_scheduled({'row': row, 'datetime': datetime_str, 'timezone': timezone})
+        except Exception as e:
+            logger.error("Error scheduling reminder %s: %s", row, e)
+
+    async def _sheets_writer_loop(self):
+        """Collect queued reminders for a short window and append them in one request."""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            items = [await self._write_queue.get()]
+            deadline = loop.time() + self.WRITE_BATCH_WINDOW
+
+            while len(items) < self.WRITE_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._write_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                rows = await asyncio.to_thread(
+                    self.sheets.add_reminders_batch, [payload for payload, _ in items]
+                )
+            except Exception as e:
+                logger.error("Error in sheets writer: %s", e)
+                rows = [None] * len(items)
+
+            for (_, future), row in zip(items, rows):
+                if not future.done():
+                    future.set_result(row)
+                self._write_queue.task_done()
+
     def _get_forward_author(self, message) -> str:
         """Extract author info from forwarded message."""
         try:
-            # Try new API (forward_origin) first
-            origin = getattr(message, 'forward_origin', None)
-            if origin:
-                # User
-                sender_user = getattr(origin, 'sender_user', None)
-                if sender_user:
-                    name = " ".join(filter(None, [sender_user.first_name, sender_user.last_name]))
-                    username = f"@{sender_user.username}" if getattr(sender_user, 'username', None) else ""
-                    return name or username or str(sender_user.id)
-
-                # Chat
-                sender_chat = getattr(origin, 'sender_chat', None)
-                if sender_chat and getattr(sender_chat, 'title', None):
-                    return f"Chat: {sender_chat.title}"
-
-                # Channel
-                channel_chat = getattr(origin, 'chat', None)
-                if channel_chat and getattr(channel_chat, 'title', None):
-                    return f"Channel: {channel_chat.title}"
-
-                # Hidden user
-                hidden_name = getattr(origin, 'sender_user_name', None)
-                if hidden_name:
-                    return hidden_name
-
-            # Fallback to old API (forward_from, forward_from_chat)
-            forward_from = getattr(message, 'forward_from', None)
+            if _HAS_FORWARD_ORIGIN:
+                origin = message.forward_origin
+                if origin:
+                    handler = _ORIGIN_HANDLERS.get(origin.type)
+                    if handler:
+                        return handler(origin) or "Unknown"
+                return "Unknown"
+
+            # Old API (forward_from, forward_from_chat)
+            forward_from = message.forward_from
             if forward_from:
-                name = " ".join(filter(None, [forward_from.first_name, forward_from.last_name]))
-                username = f"@{forward_from.username}" if getattr(forward_from, 'username', None) else ""
-                return name or username or str(forward_from.id)
+                return _format_user(forward_from)
 
-            forward_from_chat = getattr(message, 'forward_from_chat', None)
+            forward_from_chat = message.forward_from_chat
             if forward_from_chat:
                 return forward_from_chat.title or f"Chat {forward_from_chat.id}"
 
-            forward_sender_name = getattr(message, 'forward_sender_name', None)
-            if forward_sender_name:
-                return forward_sender_name
+            if message.forward_sender_name:
+                return message.forward_sender_name
 
         except Exception as e:
-            logger.error(f"Error getting forward author: {e}")
+            logger.error("Error getting forward author: %s", e)
 
         return "Unknown"
 
+    @staticmethod
+    def _fmt_dt(datetime_str: str) -> str:
+        """Format 'YYYY-MM-DD HH:MM:SS' as 'DD.MM.YYYY at HH:MM' without parsing."""
+        s = datetime_str
+        return f"{s[8:10]}.{s[5:7]}.{s[0:4]} at {s[11:13]}:{s[14:16]}"
+
     def _format_success_message(
         self,
         reminder_info: Dict,
@@ -567,7 +784,7 @@ Will be stored and reviewed weekly.
         forwarded_author: str = None
     ) -> str:
         """Format success message for created reminder."""
-        parts = ["<b>Reminder created!</b>\n"]
+        parts = [_SUCCESS_HEADER]
 
         if transcribed_text:
             parts.append(f"<b>Voice:</b> <i>{transcribed_text}</i>\n")
@@ -575,8 +792,7 @@ Will be stored and reviewed weekly.
         parts.append(f"<b>Task:</b> {reminder_info['text']}")
 
         if reminder_info.get('datetime'):
-            dt = datetime.strptime(reminder_info['datetime'], '%Y-%m-%d %H:%M:%S')
-            formatted = dt.strftime('%d.%m.%Y at %H:%M')
+            formatted = self._fmt_dt(reminder_info['datetime'])
             parts.append(f"\n<b>Time:</b> {formatted}")
             parts.append(f"\n<b>Timezone:</b> {reminder_info.get('timezone', self.timezone)}")
         else:
@@ -589,13 +805,3 @@ Will be stored and reviewed weekly.
                 parts.append(f"\n<b>From:</b> {forwarded_author}")
 
         return "".join(parts)
-
-    def _cleanup_buffer(self):
-        """Remove expired messages from buffer."""
-        current = time.time()
-        expired = [
-            uid for uid, data in self.message_buffer.items()
-            if current - data['timestamp'] > self.MESSAGE_LINK_TIMEOUT * 2
-        ]
-        for uid in expired:
-            del self.message_buffer[uid]
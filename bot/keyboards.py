@@ -1,10 +1,16 @@
+from functools import lru_cache
+
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
+# InlineKeyboardMarkup is immutable, so instances can be shared between messages
+_CONFIRM_OK_MARKUP = InlineKeyboardMarkup([[InlineKeyboardButton("OK", callback_data="confirm_ok")]])
+
 
 class Keyboards:
     """Inline keyboard builders for the bot."""
 
     @staticmethod
+    @lru_cache(maxsize=2048)
     def reminder_actions(row: int) -> InlineKeyboardMarkup:
         """
         Create keyboard for reminder notification.
@@ -21,6 +27,7 @@ class Keyboards:
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
+    @lru_cache(maxsize=2048)
     def timeless_reminder_actions(row: int) -> InlineKeyboardMarkup:
         """
         Create keyboard for weekly check of timeless reminders.
@@ -42,9 +49,4 @@ class Keyboards:
     @staticmethod
     def confirm_creation() -> InlineKeyboardMarkup:
         """Keyboard to confirm reminder was created."""
-        keyboard = [
-            [
-                InlineKeyboardButton("OK", callback_data="confirm_ok")
-            ]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+        return _CONFIRM_OK_MARKUP
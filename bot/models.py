@@ -0,0 +1,44 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Optional, Dict
+
+
+@dataclass(slots=True)
+class BufferedMessage:
+    """Message waiting in the pairing buffer (explanation or forwarded)."""
+
+    message: str
+    is_forwarded: bool
+    timestamp: float  # time.monotonic() when received
+    chat_id: int
+    forward_author: str = ''
+    pair_event: asyncio.Event = field(default_factory=asyncio.Event)
+    task: Optional[asyncio.Task] = None
+
+
+@dataclass(slots=True)
+class PendingTime:
+    """Timeless reminder waiting for the user to send a deadline."""
+
+    row: int
+    awaiting_time: bool = True
+
+
+@dataclass(slots=True)
+class LastReminder:
+    """Last reminder created by a user."""
+
+    row: int
+    text: str
+    datetime: Optional[str] = None
+    timezone: Optional[str] = None
+
+    @classmethod
+    def from_info(cls, row: int, reminder_info: Dict) -> 'LastReminder':
+        """Build from extracted reminder info."""
+        return cls(
+            row=row,
+            text=reminder_info['text'],
+            datetime=reminder_info.get('datetime'),
+            timezone=reminder_info.get('timezone')
+        )
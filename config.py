@@ -7,6 +7,15 @@ load_dotenv()
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 
+# Telegram updates: webhook if enabled, long polling otherwise
+USE_WEBHOOK = os.getenv('USE_WEBHOOK', 'false').lower() in ('1', 'true', 'yes')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # public base URL, e.g. https://bot.example.com
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN', '')  # also used as URL path
+POLLING_TIMEOUT = 30  # seconds - long polling timeout for getUpdates
+ALLOWED_UPDATES = ['message', 'callback_query']
+
 # OpenAI
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
@@ -19,6 +28,9 @@ GOOGLE_SHEETS_WORKSHEET = os.getenv('GOOGLE_SHEETS_WORKSHEET', 'reminders')
 DEFAULT_TIMEZONE = os.getenv('TIMEZONE', 'Europe/Moscow')
 
 # Scheduler settings
-REMINDER_CHECK_INTERVAL_MINUTES = 1
-WEEKLY_CHECK_DAY = 'sun'  # Day for weekly check of timeless reminders
-WEEKLY_CHECK_HOUR = 10    # Hour for weekly check
+REMINDER_RESYNC_INTERVAL_MINUTES = int(os.getenv('REMINDER_RESYNC_INTERVAL_MINUTES', '60'))  # Full sheet rescan
+WEEKLY_CHECK_DAY = os.getenv('WEEKLY_CHECK_DAY', 'sun')  # Day for weekly check of timeless reminders
+WEEKLY_CHECK_HOUR = int(os.getenv('WEEKLY_CHECK_HOUR', '10'))  # Hour for weekly check
+
+# Logging: 'text' (default) or 'json' (one JSON object per line)
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
@@ -1,105 +1,269 @@
 import os
+import signal
 import logging
 import asyncio
+import time
 from datetime import datetime
 
 import pytz
 from telegram import Bot
-from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
+from telegram.ext import AIORateLimiter, Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
 import config
 from bot.handlers import BotHandlers
 from bot.keyboards import Keyboards
 from services.openai_service import OpenAIService
-from services.google_sheets import GoogleSheetsService
+from services.google_sheets import GoogleSheetsService, to_utc_epoch
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    import json
+    ORJSON_AVAILABLE = False
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Format log records as single-line JSON (orjson if installed)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'time': self.formatTime(record),
+            'logger': record.name,
+            'level': record.levelname,
+            'msg': record.getMessage(),
+        }
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(payload, default=str).decode()
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
 
 # Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+if config.LOG_FORMAT == 'json':
+    _log_handler = logging.StreamHandler()
+    _log_handler.setFormatter(JsonLogFormatter())
+    logging.basicConfig(handlers=[_log_handler], level=logging.INFO)
+else:
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
 logger = logging.getLogger(__name__)
 
 # Global references
 bot_instance = None
 sheets_service = None
 handlers = None
+scheduler = None
+
+# Backoff for retrying a failed delivery: doubles per attempt up to the cap
+DELIVERY_RETRY_DELAY = 60  # seconds
+DELIVERY_RETRY_MAX_DELAY = 60 * 60  # seconds
+
+# Rows sent by this process that the last sheet read still showed as pending;
+# keeps a one-shot job and a resync from delivering the same reminder twice
+delivered_rows = set()
+
+
+def _reminder_epoch(reminder: dict) -> float:
+    """
+    Reminder time as Unix seconds.
+
+    Uses utc_epoch from sheet reads (computed from datetime on load) and computes
+    it for reminders passed in from the handlers.
+    """
+    epoch = reminder.get('utc_epoch')
+    if epoch is None:
+        epoch = to_utc_epoch(
+            reminder['datetime'],
+            reminder.get('timezone') or config.DEFAULT_TIMEZONE,
+            config.DEFAULT_TIMEZONE
+        )
+    if epoch is None:
+        raise ValueError(f"Invalid datetime: {reminder['datetime']}")
+    return epoch
+
+
+def schedule_reminder(reminder: dict):
+    """
+    Schedule a one-shot job that delivers the reminder at its time.
+
+    Reminders that are already due run immediately. Scheduling the same row
+    again replaces its job.
+    """
+    run_date = datetime.fromtimestamp(_reminder_epoch(reminder), tz=pytz.UTC)
+    scheduler.add_job(
+        deliver_reminder,
+        DateTrigger(run_date=run_date),
+        args=[reminder['row']],
+        id=f"reminder_{reminder['row']}",
+        replace_existing=True,
+        misfire_grace_time=None  # deliver late rather than never
+    )
+
+
+def schedule_retry(row: int, attempt: int):
+    """Schedule another delivery attempt for a row after a failed one."""
+    delay = min(DELIVERY_RETRY_DELAY * 2 ** attempt, DELIVERY_RETRY_MAX_DELAY)
+    scheduler.add_job(
+        deliver_reminder,
+        DateTrigger(run_date=datetime.fromtimestamp(time.time() + delay, tz=pytz.UTC)),
+        args=[row, attempt + 1],
+        id=f"reminder_{row}",
+        replace_existing=True,
+        misfire_grace_time=None
+    )
+    logger.info(f"Retrying reminder {row} in {delay} s")
+
+
+async def deliver_reminder(row: int, attempt: int = 0):
+    """
+    Send a scheduled reminder if it's still pending and due.
+
+    Args:
+        row: Row number
+        attempt: Number of failed attempts so far (sets the retry backoff)
+    """
+    global sheets_service
+
+    if row in delivered_rows:
+        return
+
+    try:
+        # Re-read the row: it may have been sent, rescheduled or edited since scheduling
+        reminder = await asyncio.to_thread(sheets_service.read_reminder, row)
+    except Exception as e:
+        logger.error(f"Error reading reminder {row}: {e}")
+        schedule_retry(row, attempt)
+        return
+
+    try:
+        if not reminder or not reminder.get('datetime'):
+            logger.info(f"Reminder {row} is gone or has no time, skipping")
+            return
+        if str(reminder.get('sent', '')).strip().lower() == 'true':
+            return
+        if _reminder_epoch(reminder) > time.time():
+            schedule_reminder(reminder)
+            return
+        if row in delivered_rows:  # a resync sent it while the row was being read
+            return
+
+        delivered_rows.add(row)
+        try:
+            await send_reminder_notification(reminder)
+        except Exception as e:
+            delivered_rows.discard(row)
+            logger.error(f"Error sending reminder {row}: {e}")
+            schedule_retry(row, attempt)
+            return
+        await asyncio.to_thread(sheets_service.mark_as_sent, row)
+
+    except Exception as e:
+        logger.error(f"Error delivering reminder {row}: {e}")
 
 
 async def check_and_send_reminders():
-    """Check for due reminders and send them."""
+    """
+    Resync with the sheet: send due reminders and schedule jobs for future ones.
+
+    Runs at startup and every REMINDER_RESYNC_INTERVAL_MINUTES to pick up rows
+    added or edited directly in the sheet.
+    """
     global bot_instance, sheets_service
 
     if not bot_instance or not sheets_service:
         return
 
     try:
+        await asyncio.to_thread(sheets_service.refresh)
         reminders = sheets_service.get_pending_reminders()
-        current_time = datetime.now(pytz.UTC)
+        current_time = time.time()
+
+        # Rows no longer pending in the sheet were marked as sent
+        delivered_rows.intersection_update(r['row'] for r in reminders)
+
+        due = []
 
         for reminder in reminders:
             try:
-                if not reminder.get('datetime'):
+                if not reminder.get('datetime') or reminder['row'] in delivered_rows:
                     continue
 
-                # Parse reminder time
-                tz_str = reminder.get('timezone', config.DEFAULT_TIMEZONE)
-                try:
-                    tz = pytz.timezone(tz_str)
-                except:
-                    tz = pytz.timezone(config.DEFAULT_TIMEZONE)
-
-                dt = datetime.strptime(reminder['datetime'], '%Y-%m-%d %H:%M:%S')
-                reminder_time = tz.localize(dt)
-                reminder_time_utc = reminder_time.astimezone(pytz.UTC)
-
                 # Check if it's time
-                if current_time >= reminder_time_utc:
-                    await send_reminder_notification(reminder)
-                    sheets_service.mark_as_sent(reminder['row'])
+                if current_time >= _reminder_epoch(reminder):
+                    due.append(reminder)
+                else:
+                    schedule_reminder(reminder)
 
             except Exception as e:
                 logger.error(f"Error processing reminder {reminder.get('row')}: {e}")
 
+        # Send all due reminders at once; the bot's rate limiter paces them
+        delivered_rows.update(r['row'] for r in due)
+        results = await asyncio.gather(
+            *(send_reminder_notification(r) for r in due),
+            return_exceptions=True
+        )
+
+        sent_rows = []
+        for reminder, result in zip(due, results):
+            if isinstance(result, Exception):
+                # Leave it pending and retry shortly
+                delivered_rows.discard(reminder['row'])
+                logger.error(f"Error sending reminder {reminder['row']}: {result}")
+                schedule_retry(reminder['row'], 0)
+            else:
+                sent_rows.append(reminder['row'])
+
+        await asyncio.to_thread(sheets_service.mark_many_as_sent, sent_rows)
+
     except Exception as e:
         logger.error(f"Error in check_and_send_reminders: {e}")
 
 
 async def send_reminder_notification(reminder: dict):
-    """Send reminder notification to user."""
-    global bot_instance
+    """
+    Send reminder notification to user.
 
-    try:
-        # Use user_id from reminder, fallback to config for backwards compatibility
-        chat_id = reminder.get('user_id') or config.TELEGRAM_CHAT_ID
-        if not chat_id:
-            logger.error(f"No chat_id for reminder row {reminder.get('row')}")
-            return
+    A reminder without a chat can never be sent; it is logged and skipped
+    without raising, so callers mark it as sent instead of retrying it forever.
 
-        text_parts = [f"<b>Reminder:</b>\n\n{reminder['text']}"]
+    Raises:
+        telegram.error.TelegramError: If sending fails
+    """
+    global bot_instance
 
-        # Add original message if present
-        if reminder.get('comment'):
-            text_parts.append(f"\n\n<b>Original message:</b>\n{reminder['comment']}")
-            if reminder.get('forward_author'):
-                text_parts.append(f"\n<b>From:</b> {reminder['forward_author']}")
+    # Use user_id from reminder, fallback to config for backwards compatibility
+    chat_id = reminder.get('user_id') or config.TELEGRAM_CHAT_ID
+    if not chat_id:
+        logger.error(f"No chat_id for reminder row {reminder.get('row')}, skipping")
+        return
 
-        message_text = "".join(text_parts)
-        keyboard = Keyboards.reminder_actions(reminder['row'])
+    message_text = f"<b>Reminder:</b>\n\n{reminder['text']}"
 
-        await bot_instance.send_message(
-            chat_id=chat_id,
-            text=message_text,
-            parse_mode='HTML',
-            reply_markup=keyboard
-        )
+    # Add original message if present
+    if reminder.get('comment'):
+        message_text += f"\n\n<b>Original message:</b>\n{reminder['comment']}"
+        if reminder.get('forward_author'):
+            message_text += f"\n<b>From:</b> {reminder['forward_author']}"
 
-        logger.info(f"Sent reminder to {chat_id}: {reminder['text'][:50]}...")
+    keyboard = Keyboards.reminder_actions(reminder['row'])
 
-    except Exception as e:
-        logger.error(f"Error sending reminder: {e}")
+    await bot_instance.send_message(
+        chat_id=chat_id,
+        text=message_text,
+        parse_mode='HTML',
+        reply_markup=keyboard
+    )
+
+    logger.info(f"Sent reminder to {chat_id}: {reminder['text'][:50]}...")
 
 
 async def check_timeless_reminders():
@@ -110,6 +274,7 @@ async def check_timeless_reminders():
         return
 
     try:
+        await asyncio.to_thread(sheets_service.refresh)
         reminders = sheets_service.get_timeless_reminders()
 
         for reminder in reminders:
@@ -120,16 +285,15 @@ async def check_timeless_reminders():
                     logger.error(f"No chat_id for timeless reminder row {reminder.get('row')}")
                     continue
 
-                text_parts = [
+                message_text = (
                     f"<b>Weekly review:</b>\n\n"
                     f"<b>Task:</b> {reminder['text']}\n\n"
                     f"Is this still relevant?"
-                ]
+                )
 
                 if reminder.get('comment'):
-                    text_parts.append(f"\n\n<b>Original:</b> {reminder['comment'][:100]}...")
+                    message_text += f"\n\n<b>Original:</b> {reminder['comment'][:100]}..."
 
-                message_text = "".join(text_parts)
                 keyboard = Keyboards.timeless_reminder_actions(reminder['row'])
 
                 await bot_instance.send_message(
@@ -139,9 +303,6 @@ async def check_timeless_reminders():
                     reply_markup=keyboard
                 )
 
-                # Small delay between messages
-                await asyncio.sleep(1)
-
             except Exception as e:
                 logger.error(f"Error sending timeless reminder review: {e}")
 
@@ -151,7 +312,7 @@ async def check_timeless_reminders():
 
 async def main():
     """Main entry point."""
-    global bot_instance, sheets_service, handlers
+    global bot_instance, sheets_service, handlers, scheduler
 
     # Validate config
     missing = []
@@ -159,6 +320,11 @@ async def main():
         missing.append('TELEGRAM_TOKEN')
     if not config.OPENAI_API_KEY:
         missing.append('OPENAI_API_KEY')
+    if config.USE_WEBHOOK:
+        if not config.WEBHOOK_URL:
+            missing.append('WEBHOOK_URL')
+        if not config.WEBHOOK_SECRET_TOKEN:
+            missing.append('WEBHOOK_SECRET_TOKEN')
 
     if missing:
         logger.error(f"Missing environment variables: {', '.join(missing)}")
@@ -170,17 +336,30 @@ async def main():
         sheets_service = GoogleSheetsService(
             config.GOOGLE_SHEETS_CREDS,
             config.GOOGLE_SHEETS_SPREADSHEET,
-            config.GOOGLE_SHEETS_WORKSHEET
+            config.GOOGLE_SHEETS_WORKSHEET,
+            config.DEFAULT_TIMEZONE
         )
     except Exception as e:
         logger.error(f"Failed to initialize services: {e}")
         return
 
     # Initialize handlers
-    handlers = BotHandlers(openai_service, sheets_service, config.DEFAULT_TIMEZONE)
+    handlers = BotHandlers(
+        openai_service,
+        sheets_service,
+        config.DEFAULT_TIMEZONE,
+        on_reminder_scheduled=schedule_reminder
+    )
 
     # Build application
-    application = Application.builder().token(config.TELEGRAM_TOKEN).build()
+    # Stay under Telegram's flood limits (30 msg/s overall, 20 msg/min per group)
+    rate_limiter = AIORateLimiter(
+        overall_max_rate=25,
+        overall_time_period=1,
+        group_max_rate=18,
+        group_time_period=60
+    )
+    application = Application.builder().token(config.TELEGRAM_TOKEN).rate_limiter(rate_limiter).build()
     bot_instance = application.bot
 
     # Register handlers
@@ -193,12 +372,14 @@ async def main():
     # Setup scheduler
     scheduler = AsyncIOScheduler()
 
-    # Check reminders every minute
+    # Reminders are delivered by one-shot jobs (see schedule_reminder). Resync with
+    # the sheet at startup and then every REMINDER_RESYNC_INTERVAL_MINUTES.
     scheduler.add_job(
         check_and_send_reminders,
-        CronTrigger(minute='*'),
+        IntervalTrigger(minutes=config.REMINDER_RESYNC_INTERVAL_MINUTES),
         id='check_reminders',
-        replace_existing=True
+        replace_existing=True,
+        next_run_time=datetime.now(pytz.UTC)
     )
 
     # Weekly check for timeless reminders (Sunday at 10:00)
@@ -221,11 +402,34 @@ async def main():
     try:
         await application.initialize()
         await application.start()
-        await application.updater.start_polling()
-
-        # Keep running
-        while True:
-            await asyncio.sleep(1)
+        if config.USE_WEBHOOK:
+            await application.updater.start_webhook(
+                listen=config.WEBHOOK_LISTEN,
+                port=config.WEBHOOK_PORT,
+                url_path=config.WEBHOOK_SECRET_TOKEN,
+                webhook_url=f"{config.WEBHOOK_URL.rstrip('/')}/{config.WEBHOOK_SECRET_TOKEN}",
+                secret_token=config.WEBHOOK_SECRET_TOKEN,
+                allowed_updates=config.ALLOWED_UPDATES
+            )
+            logger.info(f"Receiving updates via webhook on port {config.WEBHOOK_PORT}")
+        else:
+            await application.updater.start_polling(
+                poll_interval=0.0,
+                timeout=config.POLLING_TIMEOUT,
+                allowed_updates=config.ALLOWED_UPDATES
+            )
+            logger.info("Receiving updates via long polling")
+
+        # Keep running until SIGTERM/SIGINT
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except NotImplementedError:
+                pass  # Windows: Ctrl+C still raises KeyboardInterrupt
+        await stop_event.wait()
+        logger.info("Shutting down...")
 
     except KeyboardInterrupt:
         logger.info("Shutting down...")
@@ -233,7 +437,10 @@ async def main():
         logger.error(f"Error in main: {e}")
     finally:
         scheduler.shutdown()
+        if application.updater.running:
+            await application.updater.stop()
         await application.stop()
+        await handlers.close()
         logger.info("Shutdown complete")
 
 
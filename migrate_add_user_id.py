@@ -37,10 +37,13 @@ def migrate():
     header = all_values[0]
     print(f"Current headers: {header}")
 
+    # Collect all cell writes and send them in a single batch request
+    updates = []
+
     # Add user_id header if missing
     if len(header) < 8 or header[7] != 'user_id':
         print("Adding 'user_id' header...")
-        worksheet.update_cell(1, 8, 'user_id')
+        updates.append({'range': 'H1', 'values': [['user_id']]})
     else:
         print("'user_id' header already exists")
 
@@ -53,9 +56,12 @@ def migrate():
         current_user_id = row[7] if len(row) > 7 else ''
 
         if not current_user_id:
-            worksheet.update_cell(i, 8, DEFAULT_USER_ID)
+            updates.append({'range': f'H{i}', 'values': [[DEFAULT_USER_ID]]})
             updated += 1
-            print(f"Updated row {i} with user_id={DEFAULT_USER_ID}")
+            print(f"Updating row {i} with user_id={DEFAULT_USER_ID}")
+
+    if updates:
+        worksheet.batch_update(updates, value_input_option='RAW')
 
     print(f"\nMigration complete! Updated {updated} rows.")
 
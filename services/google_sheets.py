@@ -1,8 +1,12 @@
 import logging
-from typing import List, Dict, Optional
+import re
+import threading
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 
 import gspread
+import pytz
 from google.oauth2.service_account import Credentials
 
 logger = logging.getLogger(__name__)
@@ -12,6 +16,116 @@ SCOPES = [
     'https://www.googleapis.com/auth/drive'
 ]
 
+# Row number of the first cell in an A1 range (e.g. 'A42:H42' -> 42)
+_ROW_RE = re.compile(r'\$?[A-Z]+\$?(\d+)')
+
+
+@lru_cache(maxsize=128)
+def _tz(name: str):
+    """Cached pytz timezone lookup (raises UnknownTimeZoneError)."""
+    return pytz.timezone(name)
+
+
+def to_utc_epoch(
+    datetime_str: Optional[str],
+    timezone: str,
+    default_timezone: str = 'Europe/Moscow'
+) -> Optional[float]:
+    """
+    Convert local 'YYYY-MM-DD HH:MM:SS' in timezone to Unix seconds.
+
+    Unknown timezones fall back to default_timezone.
+
+    Returns:
+        Unix seconds, or None for timeless reminders and unparsable input
+    """
+    if not datetime_str:
+        return None
+    try:
+        tz = _tz(timezone)
+    except pytz.UnknownTimeZoneError:
+        tz = _tz(default_timezone)
+    try:
+        dt = datetime.fromisoformat(datetime_str)
+    except ValueError:
+        return None
+    return tz.localize(dt).timestamp()
+
+
+class _SheetWriteQueue:
+    """
+    Coalesces single-cell writes and sends them in one batch_update.
+
+    Writes are flushed FLUSH_DELAY seconds after the first one is queued, or
+    immediately once MAX_PENDING cells are waiting. A later write to the same
+    cell replaces the queued value. Thread-safe; flushes run one at a time, so
+    a flush returns only after any in-flight write has finished.
+    """
+
+    FLUSH_DELAY = 0.5  # seconds
+    RETRY_DELAY = 5  # seconds - after a failed flush
+    MAX_PENDING = 100  # cells
+
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # held for a whole flush, including the request
+        self._buf: Dict[Tuple[int, int], str] = {}
+        self._timer: Optional[threading.Timer] = None
+
+    def enqueue(self, row: int, col: int, value: str):
+        """Queue a cell value for the next flush."""
+        with self._lock:
+            self._buf[(row, col)] = value
+            flush_now = len(self._buf) >= self.MAX_PENDING
+            if not flush_now:
+                self._arm(self.FLUSH_DELAY)
+        if flush_now:
+            self.flush()
+
+    def flush(self) -> bool:
+        """
+        Send all queued cells in a single batch_update.
+
+        Returns:
+            True if successful (failed cells are queued again)
+        """
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                buf, self._buf = self._buf, {}
+
+            if not buf:
+                return True
+
+            try:
+                self.worksheet.batch_update(
+                    [
+                        {'range': gspread.utils.rowcol_to_a1(row, col), 'values': [[value]]}
+                        for (row, col), value in buf.items()
+                    ],
+                    value_input_option='RAW'
+                )
+                logger.info(f"Flushed {len(buf)} queued cell updates")
+                return True
+            except Exception as e:
+                logger.error(f"Error flushing cell updates: {e}")
+                with self._lock:
+                    # Keep newer values queued meanwhile
+                    for cell, value in buf.items():
+                        self._buf.setdefault(cell, value)
+                    self._arm(self.RETRY_DELAY)
+                return False
+
+    def _arm(self, delay: float):
+        """Start the flush timer unless one is running. Call with _lock held."""
+        if self._timer is None:
+            self._timer = threading.Timer(delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
 
 class GoogleSheetsService:
     """
@@ -20,6 +134,14 @@ class GoogleSheetsService:
     Table structure:
     | datetime | text | timezone | sent | status | comment | forward_author | user_id |
     |----------|------|----------|------|--------|---------|----------------|---------|
+
+    Reminder dicts also carry utc_epoch, the reminder time as Unix seconds. It
+    is computed from datetime and timezone when rows are loaded, not stored, so
+    deadlines edited by hand in the sheet take effect.
+
+    Pending and timeless reminders are kept in an in-memory index loaded at
+    startup and updated on every write, so reads don't hit the API. Call
+    refresh() to pick up edits made directly in the sheet.
     """
 
     COLUMNS = {
@@ -33,7 +155,16 @@ class GoogleSheetsService:
         'user_id': 8
     }
 
-    def __init__(self, creds_path: str, spreadsheet_name: str, worksheet_name: str = 'reminders'):
+    # Data rows below the header, one column per COLUMNS entry
+    DATA_RANGE = 'A2:H'
+
+    def __init__(
+        self,
+        creds_path: str,
+        spreadsheet_name: str,
+        worksheet_name: str = 'reminders',
+        default_timezone: str = 'Europe/Moscow'
+    ):
         """
         Initialize Google Sheets connection.
 
@@ -41,13 +172,23 @@ class GoogleSheetsService:
             creds_path: Path to service account credentials JSON
             spreadsheet_name: Name of the spreadsheet
             worksheet_name: Name of the worksheet
+            default_timezone: Timezone for rows with an empty or unknown timezone
         """
+        self.default_timezone = default_timezone
         try:
             creds = Credentials.from_service_account_file(creds_path, scopes=SCOPES)
             self.gc = gspread.authorize(creds)
             self.spreadsheet = self.gc.open(spreadsheet_name)
             self.worksheet = self.spreadsheet.worksheet(worksheet_name)
             logger.info(f"Connected to Google Sheets: {spreadsheet_name}/{worksheet_name}")
+
+            # Methods are called from worker threads (asyncio.to_thread)
+            self._lock = threading.Lock()
+            self._pending: Dict[int, Dict] = {}
+            self._timeless: Dict[int, Dict] = {}
+            self._writes = _SheetWriteQueue(self.worksheet)
+            if not self.refresh():
+                raise RuntimeError("Initial load of reminders failed")
         except Exception as e:
             logger.error(f"Failed to connect to Google Sheets: {e}")
             raise
@@ -76,63 +217,97 @@ class GoogleSheetsService:
             Row number if successful, None otherwise
         """
         try:
-            row = [
-                datetime_str or '',  # datetime
-                text,                 # text
-                timezone,             # timezone
-                'FALSE',              # sent
-                '',                   # status
-                comment,              # comment (original forwarded text)
-                forward_author,       # forward_author
-                str(user_id) if user_id else ''  # user_id
-            ]
+            row = self._build_row(text, datetime_str, timezone, comment, forward_author, user_id)
 
             logger.info(f"Adding reminder: {row}")
-            self.worksheet.append_row(row)
-
-            # Get the row number
-            all_values = self.worksheet.get_all_values()
-            row_number = len(all_values)
+            response = self.worksheet.append_row(row, include_values_in_response=False)
 
+            row_number = self._first_appended_row(response)
+            with self._lock:
+                self._index(self._row_to_dict(row_number, row))
             return row_number
 
         except Exception as e:
             logger.error(f"Error adding reminder: {e}")
             return None
 
-    def get_pending_reminders(self) -> List[Dict]:
+    def add_reminders_batch(self, reminders: List[Dict]) -> List[Optional[int]]:
         """
-        Get all reminders that haven't been sent yet and have a datetime set.
+        Add several reminders with a single append request.
+
+        Args:
+            reminders: List of dicts with add_reminder keyword arguments
 
         Returns:
-            List of reminder dictionaries
+            Row numbers in the same order as input (None for all on failure)
         """
+        if not reminders:
+            return []
+
         try:
-            records = self.worksheet.get_all_records()
-            reminders = []
-
-            for i, row in enumerate(records, start=2):  # Row 1 is header
-                sent = str(row.get('sent', '')).strip().lower()
-                datetime_val = row.get('datetime', '')
-
-                # Only get reminders with datetime that haven't been sent
-                if datetime_val and sent != 'true':
-                    reminders.append({
-                        'row': i,
-                        'datetime': datetime_val,
-                        'text': row.get('text', ''),
-                        'timezone': row.get('timezone', 'Europe/Moscow'),
-                        'comment': row.get('comment', ''),
-                        'forward_author': row.get('forward_author', ''),
-                        'status': row.get('status', ''),
-                        'user_id': row.get('user_id', '')
-                    })
-
-            return reminders
+            rows = [
+                self._build_row(
+                    r['text'],
+                    r.get('datetime_str'),
+                    r.get('timezone', 'Europe/Moscow'),
+                    r.get('comment', ''),
+                    r.get('forward_author', ''),
+                    r.get('user_id')
+                )
+                for r in reminders
+            ]
+
+            logger.info(f"Adding {len(rows)} reminders in batch")
+            response = self.worksheet.append_rows(rows, include_values_in_response=False)
+
+            first_row = self._first_appended_row(response)
+            row_numbers = list(range(first_row, first_row + len(rows)))
+            with self._lock:
+                for row_number, values in zip(row_numbers, rows):
+                    self._index(self._row_to_dict(row_number, values))
+            return row_numbers
 
         except Exception as e:
-            logger.error(f"Error getting pending reminders: {e}")
-            return []
+            logger.error(f"Error adding reminders batch: {e}")
+            return [None] * len(reminders)
+
+    @staticmethod
+    def _first_appended_row(response: Dict) -> int:
+        """Row number of the first appended row, from updatedRange like 'reminders'!A42:H42."""
+        updated_range = response['updates']['updatedRange']
+        cells = updated_range.rsplit('!', 1)[-1]
+        return int(_ROW_RE.match(cells).group(1))
+
+    @staticmethod
+    def _build_row(
+        text: str,
+        datetime_str: Optional[str],
+        timezone: str,
+        comment: str,
+        forward_author: str,
+        user_id: Optional[int]
+    ) -> List[str]:
+        """Build sheet row values in COLUMNS order."""
+        return [
+            datetime_str or '',  # datetime
+            text,                 # text
+            timezone,             # timezone
+            'FALSE',              # sent
+            '',                   # status
+            comment,              # comment (original forwarded text)
+            forward_author,       # forward_author
+            str(user_id) if user_id else ''  # user_id
+        ]
+
+    def get_pending_reminders(self) -> List[Dict]:
+        """
+        Get all reminders that haven't been sent yet and have a datetime set.
+
+        Returns:
+            List of reminder dictionaries
+        """
+        with self._lock:
+            return [dict(r) for r in self._pending.values()]
 
     def get_timeless_reminders(self) -> List[Dict]:
         """
@@ -141,90 +316,163 @@ class GoogleSheetsService:
         Returns:
             List of reminder dictionaries without datetime
         """
-        try:
-            records = self.worksheet.get_all_records()
-            reminders = []
-
-            for i, row in enumerate(records, start=2):
-                datetime_val = row.get('datetime', '')
-                status = row.get('status', '').strip().lower()
-
-                # Get reminders without datetime that aren't done/canceled
-                if not datetime_val and status not in ['done', 'canceled']:
-                    reminders.append({
-                        'row': i,
-                        'text': row.get('text', ''),
-                        'timezone': row.get('timezone', 'Europe/Moscow'),
-                        'comment': row.get('comment', ''),
-                        'forward_author': row.get('forward_author', ''),
-                        'user_id': row.get('user_id', '')
-                    })
-
-            return reminders
+        with self._lock:
+            return [dict(r) for r in self._timeless.values()]
 
-        except Exception as e:
-            logger.error(f"Error getting timeless reminders: {e}")
-            return []
+    def refresh(self) -> bool:
+        """
+        Rebuild the in-memory index from the sheet.
+
+        Returns:
+            True if successful (the previous index is kept on failure)
+        """
+        # Reading the sheet with writes still queued would index stale values
+        if not self._writes.flush():
+            logger.error("Keeping the current index: queued writes could not be saved")
+            return False
 
-    def mark_as_sent(self, row: int) -> bool:
-        """Mark a reminder as sent."""
         try:
-            self.worksheet.update_cell(row, self.COLUMNS['sent'], 'TRUE')
-            logger.info(f"Marked row {row} as sent")
+            # Formatted values on purpose: USER_ENTERED cells (older rows, manual
+            # edits) would come back unformatted as date serials and booleans
+            rows = self.worksheet.get(self.DATA_RANGE)
+            reminders = [
+                self._row_to_dict(i, values)
+                for i, values in enumerate(rows, start=2)  # Row 1 is header
+            ]
+
+            with self._lock:
+                self._pending.clear()
+                self._timeless.clear()
+                for reminder in reminders:
+                    self._index(reminder)
+
+            logger.info(f"Loaded {len(self._pending)} pending and {len(self._timeless)} timeless reminders")
             return True
+
         except Exception as e:
-            logger.error(f"Error marking as sent: {e}")
+            logger.error(f"Error loading reminders: {e}")
             return False
 
-    def update_status(self, row: int, status: str) -> bool:
+    def _index(self, reminder: Dict):
+        """Put a reminder into the index it belongs to, or drop it. Call with _lock held."""
+        row = reminder['row']
+        self._pending.pop(row, None)
+        self._timeless.pop(row, None)
+
+        if reminder['datetime']:
+            # Only reminders with datetime that haven't been sent
+            if str(reminder['sent']).strip().lower() != 'true':
+                self._pending[row] = reminder
+        elif str(reminder['status']).strip().lower() not in ['done', 'canceled']:
+            self._timeless[row] = reminder
+
+    def _update_indexed(self, row: int, **changes):
+        """Apply written values to an indexed reminder and re-index it."""
+        with self._lock:
+            reminder = self._pending.get(row) or self._timeless.get(row)
+            if reminder:
+                reminder.update(changes)
+                self._index(reminder)
+
+    def _row_to_dict(self, row: int, values: List) -> Dict:
+        """Convert positional row values (trailing empty cells may be missing) to a reminder dict."""
+        def cell(name: str, default=''):
+            index = self.COLUMNS[name] - 1
+            return values[index] if index < len(values) else default
+
+        datetime_str = cell('datetime')
+        timezone = cell('timezone') or self.default_timezone
+
+        return {
+            'row': row,
+            'datetime': datetime_str,
+            'text': cell('text'),
+            'timezone': timezone,
+            'sent': cell('sent'),
+            'status': cell('status'),
+            'comment': cell('comment'),
+            'forward_author': cell('forward_author'),
+            'user_id': cell('user_id'),
+            # Derived from datetime once per load, not stored in the sheet
+            'utc_epoch': to_utc_epoch(datetime_str, timezone, self.default_timezone)
+        }
+
+    def mark_as_sent(self, row: int):
+        """Mark a reminder as sent."""
+        self.mark_many_as_sent([row])
+
+    def mark_many_as_sent(self, rows: List[int]):
+        """
+        Mark several reminders as sent (queued, written in one batch).
+
+        Queued writes can't fail here; a failed flush is logged and retried.
+        """
+        col = self.COLUMNS['sent']
+        for row in rows:
+            self._writes.enqueue(row, col, 'TRUE')
+            self._update_indexed(row, sent='TRUE')
+        if rows:
+            logger.info(f"Marked rows {rows} as sent")
+
+    def update_status(self, row: int, status: str):
         """
-        Update reminder status.
+        Update reminder status (queued, written in the next batch).
 
         Args:
             row: Row number
             status: New status ('done' or 'canceled')
         """
-        try:
-            self.worksheet.update_cell(row, self.COLUMNS['status'], status)
-            logger.info(f"Updated row {row} status to: {status}")
-            return True
-        except Exception as e:
-            logger.error(f"Error updating status: {e}")
-            return False
+        self._writes.enqueue(row, self.COLUMNS['status'], status)
+        self._update_indexed(row, status=status)
+        logger.info(f"Updated row {row} status to: {status}")
 
-    def update_datetime(self, row: int, datetime_str: str) -> bool:
+    def update_datetime(self, row: int, datetime_str: str, timezone: str = 'Europe/Moscow'):
         """
         Update reminder datetime (for converting timeless to timed reminders).
 
         Args:
             row: Row number
             datetime_str: New datetime string
+            timezone: Timezone of datetime_str (also written to the row)
         """
-        try:
-            self.worksheet.update_cell(row, self.COLUMNS['datetime'], datetime_str)
-            logger.info(f"Updated row {row} datetime to: {datetime_str}")
-            return True
-        except Exception as e:
-            logger.error(f"Error updating datetime: {e}")
-            return False
+        utc_epoch = to_utc_epoch(datetime_str, timezone, self.default_timezone)
+        self._writes.enqueue(row, self.COLUMNS['datetime'], datetime_str)
+        self._writes.enqueue(row, self.COLUMNS['timezone'], timezone)
+        self._update_indexed(row, datetime=datetime_str, timezone=timezone, utc_epoch=utc_epoch)
+        logger.info(f"Updated row {row} datetime to: {datetime_str} ({timezone})")
+
+    def flush_writes(self) -> bool:
+        """Write all queued cell updates now (call on shutdown)."""
+        return self._writes.flush()
 
     def get_reminder_by_row(self, row: int) -> Optional[Dict]:
         """Get a reminder by row number."""
         try:
-            row_values = self.worksheet.row_values(row)
-            if len(row_values) >= 2:
-                return {
-                    'row': row,
-                    'datetime': row_values[0] if len(row_values) > 0 else '',
-                    'text': row_values[1] if len(row_values) > 1 else '',
-                    'timezone': row_values[2] if len(row_values) > 2 else 'Europe/Moscow',
-                    'sent': row_values[3] if len(row_values) > 3 else '',
-                    'status': row_values[4] if len(row_values) > 4 else '',
-                    'comment': row_values[5] if len(row_values) > 5 else '',
-                    'forward_author': row_values[6] if len(row_values) > 6 else '',
-                    'user_id': row_values[7] if len(row_values) > 7 else ''
-                }
-            return None
+            return self.read_reminder(row)
         except Exception as e:
             logger.error(f"Error getting reminder by row: {e}")
             return None
+
+    def read_reminder(self, row: int) -> Optional[Dict]:
+        """
+        Read a reminder row from the sheet and re-index it.
+
+        Returns:
+            Reminder dict, or None if the row is empty
+
+        Raises:
+            Exception: API errors, so callers can tell them from an empty row
+        """
+        # Don't read back values still in the queue
+        if not self._writes.flush():
+            raise RuntimeError("Queued sheet writes could not be saved")
+        # Only the data columns; rows past the last value come back empty
+        values = self.worksheet.get(f'A{row}:H{row}')
+        row_values = values[0] if values else []
+        if len(row_values) < 2:
+            return None
+
+        reminder = self._row_to_dict(row, row_values)
+        with self._lock:
+            self._index(dict(reminder))
+        return reminder
@@ -1,53 +1,16 @@
-import os
 import json
 import logging
-import tempfile
 from datetime import datetime
 from typing import Optional, Dict, Tuple
 
 import openai
 import pytz
-import requests
-
-try:
-    from pydub import AudioSegment
-    PYDUB_AVAILABLE = True
-except ImportError:
-    PYDUB_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
-
-class OpenAIService:
-    """Service for OpenAI API interactions: date parsing and voice transcription."""
-
-    def __init__(self, api_key: str, timezone: str = 'Europe/Moscow'):
-        self.client = openai.OpenAI(api_key=api_key)
-        self.timezone = timezone
-
-    def extract_reminder_info(self, message: str) -> Optional[Dict]:
-        """
-        Extract reminder information from text message using GPT-4.
-
-        Handles complex date/time expressions like:
-        - "through 10 hours"
-        - "on the 10th" (current month)
-        - "on Sunday" (nearest)
-        - "30 hours before 18:00 on October 29th"
-
-        Returns:
-            Dict with 'text', 'datetime' (or None), 'timezone'
-        """
-        try:
-            tz = pytz.timezone(self.timezone)
-            current_time = datetime.now(tz)
-            current_time_str = current_time.strftime('%Y-%m-%d %H:%M:%S')
-            weekday_name = current_time.strftime('%A')
-
-            system_prompt = f"""You are a precise date/time extraction assistant for a reminder bot.
-
-CURRENT DATE AND TIME: {current_time_str} ({self.timezone})
-CURRENT DAY OF WEEK: {weekday_name}
+# Static part of the extraction prompt. Kept as an unchanging prefix so
+# OpenAI prompt caching can reuse it; per-request values go in the suffix.
+_SYSTEM_PROMPT_RULES = """You are a precise date/time extraction assistant for a reminder bot.
 
 Your task: Extract reminder information from user messages in Russian.
 
@@ -88,48 +51,82 @@ RULES FOR DATE/TIME CALCULATION:
    - "напомни сегодня поспать" = current time + 1 hour
    - "напомни позже про звонок" = current time + 1 hour
 
-CRITICAL: Never return a past date/time. Always calculate relative to {current_time_str}.
+CRITICAL: Never return a past date/time. Always calculate relative to CURRENT DATE AND TIME below.
 
 EXTRACT:
 1. text: The reminder content (what to remind about), in Russian, starting with capital letter
 2. datetime: In format "YYYY-MM-DD HH:MM:SS" or null if no time specified
-3. timezone: "{self.timezone}"
+3. timezone: the TIMEZONE value given below
 
 Return ONLY a JSON object:
-{{"text": "reminder text", "datetime": "YYYY-MM-DD HH:MM:SS" or null, "timezone": "{self.timezone}"}}
+{"text": "reminder text", "datetime": "YYYY-MM-DD HH:MM:SS" or null, "timezone": "<TIMEZONE from below>"}
 """
 
-            response = self.client.chat.completions.create(
+_SYSTEM_PROMPT_CONTEXT = """
+CURRENT DATE AND TIME: {current_time_str} ({timezone})
+CURRENT DAY OF WEEK: {weekday_name}
+TIMEZONE: {timezone}
+"""
+
+
+class OpenAIService:
+    """Service for OpenAI API interactions: date parsing and voice transcription."""
+
+    def __init__(self, api_key: str, timezone: str = 'Europe/Moscow'):
+        self.client = openai.AsyncOpenAI(api_key=api_key)
+        self.timezone = timezone
+
+    async def close(self):
+        """Close the OpenAI client's HTTP connections."""
+        await self.client.close()
+
+    async def extract_reminder_info(self, message: str) -> Optional[Dict]:
+        """
+        Extract reminder information from text message using GPT-4.
+
+        Handles complex date/time expressions like:
+        - "through 10 hours"
+        - "on the 10th" (current month)
+        - "on Sunday" (nearest)
+        - "30 hours before 18:00 on October 29th"
+
+        Returns:
+            Dict with 'text', 'datetime' (or None), 'timezone'
+        """
+        try:
+            tz = pytz.timezone(self.timezone)
+            current_time = datetime.now(tz)
+            current_time_str = current_time.strftime('%Y-%m-%d %H:%M:%S')
+            weekday_name = current_time.strftime('%A')
+
+            system_prompt = _SYSTEM_PROMPT_RULES + _SYSTEM_PROMPT_CONTEXT.format_map({
+                'current_time_str': current_time_str,
+                'weekday_name': weekday_name,
+                'timezone': self.timezone
+            })
+
+            response = await self.client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": message}
                 ],
                 temperature=0.1,
-                max_tokens=300
+                max_tokens=150,
+                # JSON mode: the reply is always a bare JSON object
+                response_format={"type": "json_object"}
             )
 
-            result = response.choices[0].message.content.strip()
-
-            # Clean up response - remove markdown code blocks if present
-            if result.startswith("```"):
-                result = result.split("```")[1]
-                if result.startswith("json"):
-                    result = result[4:]
-                result = result.strip()
-
+            result = response.choices[0].message.content
             reminder_info = json.loads(result)
 
-            if reminder_info is None:
-                return None
-
             if 'text' not in reminder_info:
                 logger.warning(f"Missing 'text' in reminder info: {reminder_info}")
                 return None
 
-            # Ensure timezone is set
-            if 'timezone' not in reminder_info:
-                reminder_info['timezone'] = self.timezone
+            # The datetime is computed in the prompt's timezone, so that is the
+            # reminder's timezone whatever the model echoes
+            reminder_info['timezone'] = self.timezone
 
             logger.info(f"Extracted reminder info: {reminder_info}")
             return reminder_info
@@ -161,7 +158,10 @@ Return ONLY a JSON object:
         datetime_str = reminder_info['datetime']
 
         try:
-            dt = datetime.strptime(datetime_str, '%Y-%m-%d %H:%M:%S')
+            # Exactly 'YYYY-MM-DD HH:MM:SS' (fromisoformat alone also accepts shorter forms)
+            if not isinstance(datetime_str, str) or len(datetime_str) != 19:
+                raise ValueError(datetime_str)
+            dt = datetime.fromisoformat(datetime_str)
 
             # Check if time is in the past (with 1 minute buffer)
             tz = pytz.timezone(reminder_info.get('timezone', self.timezone))
@@ -172,10 +172,12 @@ Return ONLY a JSON object:
 
         except ValueError:
             return False, "Invalid datetime format"
+        except pytz.UnknownTimeZoneError:
+            return False, "Unknown timezone"
 
         return True, ""
 
-    def extract_and_validate(self, message: str) -> Tuple[Optional[Dict], str]:
+    async def extract_and_validate(self, message: str) -> Tuple[Optional[Dict], str]:
         """
         Extract and validate reminder info in one call.
         If validation fails due to past time, retry with adjustment.
@@ -183,7 +185,7 @@ Return ONLY a JSON object:
         Returns:
             Tuple of (reminder_info or None, error_message)
         """
-        reminder_info = self.extract_reminder_info(message)
+        reminder_info = await self.extract_reminder_info(message)
 
         if reminder_info is None:
             return None, "Could not parse reminder"
@@ -200,7 +202,7 @@ Return ONLY a JSON object:
 IMPORTANT: Previous calculation resulted in a past time.
 Recalculate to get the NEAREST FUTURE date/time while preserving the original intent."""
 
-            reminder_info = self.extract_reminder_info(adjusted_message)
+            reminder_info = await self.extract_reminder_info(adjusted_message)
             if reminder_info:
                 is_valid, error = self.validate_reminder_info(reminder_info)
                 if is_valid:
@@ -208,7 +210,7 @@ Recalculate to get the NEAREST FUTURE date/time while preserving the original in
 
         return None, error
 
-    def extract_forwarded_message_info(self, forwarded_text: str) -> Optional[Dict]:
+    async def extract_forwarded_message_info(self, forwarded_text: str) -> Optional[Dict]:
         """
         Extract reminder info from a forwarded message (without user explanation).
         Creates a task description from the forwarded content.
@@ -219,7 +221,7 @@ If there's a date/time mentioned, extract it. If not, datetime should be null.
 
 Forwarded message: {forwarded_text}"""
 
-        return self.extract_reminder_info(prompt)
+        return await self.extract_reminder_info(prompt)
 
     async def transcribe_voice(self, audio_data: bytes) -> Optional[str]:
         """
@@ -231,33 +233,13 @@ Forwarded message: {forwarded_text}"""
         Returns:
             Transcribed text or None
         """
-        if not PYDUB_AVAILABLE:
-            logger.error("pydub not available for audio conversion")
-            return None
-
-        temp_input = None
-        temp_output = None
-
         try:
-            # Save OGG to temp file
-            with tempfile.NamedTemporaryFile(suffix='.ogg', delete=False) as f:
-                f.write(audio_data)
-                temp_input = f.name
-
-            # Convert to MP3
-            with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as f:
-                temp_output = f.name
-
-            audio = AudioSegment.from_ogg(temp_input)
-            audio.export(temp_output, format="mp3")
-
-            # Transcribe with Whisper
-            with open(temp_output, 'rb') as audio_file:
-                transcript = self.client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    language="ru"
-                )
+            # Whisper accepts Telegram's OGG/Opus as is; the file name tells it the format
+            transcript = await self.client.audio.transcriptions.create(
+                model="whisper-1",
+                file=("voice.ogg", audio_data),
+                language="ru"
+            )
 
             text = transcript.text.strip()
             logger.info(f"Transcribed voice: {text}")
@@ -266,29 +248,3 @@ Forwarded message: {forwarded_text}"""
         except Exception as e:
             logger.error(f"Error transcribing voice: {e}")
             return None
-        finally:
-            # Cleanup temp files
-            for path in [temp_input, temp_output]:
-                if path and os.path.exists(path):
-                    try:
-                        os.remove(path)
-                    except:
-                        pass
-
-    async def download_and_transcribe(self, file_url: str) -> Optional[str]:
-        """
-        Download audio from URL and transcribe it.
-
-        Args:
-            file_url: URL to audio file
-
-        Returns:
-            Transcribed text or None
-        """
-        try:
-            response = requests.get(file_url, timeout=30)
-            response.raise_for_status()
-            return await self.transcribe_voice(response.content)
-        except Exception as e:
-            logger.error(f"Error downloading audio: {e}")
-            return None